@@ -1,9 +1,11 @@
 import streamlit as st
 import requests
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from shared_cache import shared_cache
+from query_service import QueryClient, QUERY_SERVICE_URL
+from scenario_sweep import build_scenario_cube, slice_events, CABIN_CONFIGURATIONS
 
 # Set the page layout to wide
 st.set_page_config(layout="wide")
@@ -46,9 +48,11 @@ with tabs[2]:
     """)
 
     # Fetch data function
+    SENSORNET_URL = 'https://sensornet.nl/dataserver3/event/collection/nina_events/stream?conditions%5B0%5D%5B%5D=time&conditions%5B0%5D%5B%5D=%3E%3D&conditions%5B0%5D%5B%5D=1735689600&conditions%5B1%5D%5B%5D=time&conditions%5B1%5D%5B%5D=%3C&conditions%5B1%5D%5B%5D=1742774400'
+
     @st.cache_data
-    def fetch_data():
-        url = 'https://sensornet.nl/dataserver3/event/collection/nina_events/stream?conditions%5B0%5D%5B%5D=time&conditions%5B0%5D%5B%5D=%3E%3D&conditions%5B0%5D%5B%5D=1735689600&conditions%5B1%5D%5B%5D=time&conditions%5B1%5D%5B%5D=%3C&conditions%5B1%5D%5B%5D=1742774400'
+    @shared_cache('sensornet_events')
+    def fetch_data(url=SENSORNET_URL):
         
         try:
             response = requests.get(url)
@@ -64,6 +68,11 @@ with tabs[2]:
         except requests.exceptions.RequestException:
             return None
 
+    # With the local query service running only the two columns the scenarios need are pulled
+    @st.cache_data
+    def fetch_service_events(url):
+        return QueryClient(url).events(columns=['type', 'SEL_dB'])
+
     # Mock data function
     def get_mock_data():
         data = pd.DataFrame({
@@ -75,29 +84,14 @@ with tabs[2]:
         })
         return data
 
-    # Function to calculate noise per passenger and cargo
+    # Scenario cube: every event against all load factors and cabin configurations at once
     @st.cache_data
-    def calculate_noise_per_passenger_and_cargo(data, aircraft_capacity, load_factor):
-        results = []
-        for _, row in data.iterrows():
-            aircraft_type = row['vliegtuig_type']
-            if aircraft_type in aircraft_capacity:
-                sel_dB = row['SEL_dB']
-                passengers = aircraft_capacity[aircraft_type]['passengers']
-                cargo_ton = aircraft_capacity[aircraft_type]['cargo_ton']
-                
-                occupied_passengers = passengers * load_factor
-                noise_per_passenger = sel_dB / occupied_passengers if occupied_passengers != 0 else np.nan
-                noise_per_cargo = sel_dB / cargo_ton if cargo_ton != 0 else np.nan
-                
-                results.append({
-                    'aircraft_type': aircraft_type,
-                    'passengers': passengers,
-                    'noise_per_passenger': noise_per_passenger,
-                    'noise_per_cargo': noise_per_cargo
-                })
-
-        return pd.DataFrame(results)
+    @shared_cache('noise_scenario_cube', version='2')
+    def calculate_noise_scenarios(data, aircraft_capacity, type_col):
+        return build_scenario_cube(data, aircraft_capacity, type_col=type_col)
+
+    # English display names for the cabin configurations
+    CABIN_LABELS = {'Standaard': 'Standard', 'Hoge dichtheid': 'High density', 'Premium': 'Premium'}
 
     # Aircraft capacity data
     aircraft_capacity = {
@@ -113,16 +107,21 @@ with tabs[2]:
         'Boeing 787-9': {'passengers': 296, 'cargo_ton': 45}
     }
 
-    # Load factor
-    load_factor = 0.85
+    # Load factor and cabin configuration (sliced from the cached scenario cube)
+    load_factor = st.slider('Load factor', 0.5, 1.0, 0.85, 0.05)
+    cabin_configuration = st.selectbox(
+        'Cabin configuration', list(CABIN_CONFIGURATIONS), format_func=lambda name: CABIN_LABELS.get(name, name)
+    )
 
     # Get data
-    data = fetch_data()
-    if data is None:
+    data = fetch_service_events(QUERY_SERVICE_URL) if QUERY_SERVICE_URL else fetch_data()
+    if data is None or data.empty:
         data = get_mock_data()
 
     # Perform calculations
-    results = calculate_noise_per_passenger_and_cargo(data, aircraft_capacity, load_factor)
+    type_col = 'vliegtuig_type' if 'vliegtuig_type' in data.columns else 'type'
+    scenarios = calculate_noise_scenarios(data, aircraft_capacity, type_col)
+    results = slice_events(scenarios, load_factor, cabin_configuration)
 
     # Sort results
     sorted_results_passenger = results.sort_values(by='noise_per_passenger')
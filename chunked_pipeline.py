@@ -0,0 +1,150 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from flight_tracks import prepare_tracks
+
+# -------------------------------------------------------------------------
+# Out-of-core pipeline for multi-day FlightAware archives.
+#
+# Every CSV is streamed in fixed-size chunks through:
+#   parse -> time normalize -> 20 km Schiphol filter -> per-minute aggregation -> export
+# Only one chunk per file is in memory at a time. The filtered rows are
+# appended to <out_dir>/<name>_schiphol.csv, where <name> is the path relative
+# to the common folder of all inputs (2025-03-24/flights.csv ->
+# 2025-03-24__flights_schiphol.csv), so daily scrapes with the same file name
+# don't overwrite each other. The per-minute aggregation keeps
+# running sums and counts (so means stay exact across chunk and file
+# boundaries) and is written once at the end. Files run in parallel.
+#
+#   python chunked_pipeline.py archive/*.csv --out-dir output --workers 8
+# -------------------------------------------------------------------------
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_RADIUS_KM = 20
+
+# Same columns the notebooks average per minute
+NUMERIC_COLUMNS = ['Latitude', 'Longitude', 'Course', 'Speed_kts', 'Speed_mph',
+                   'Altitude_feet', 'ClimbRate', 'DistanceToSchiphol']
+
+
+def minute_partials(tracks, by=None):
+    """
+    Sums and counts per minute (the groupby(['year','month','day','hour','minute'])
+    step) for the numeric columns, so partial results can simply be added.
+    """
+    keys = [tracks['time'].dt.floor('min').rename('minute')] + [tracks[c] for c in (by or [])]
+    numeric = tracks[[c for c in NUMERIC_COLUMNS if c in tracks.columns]]
+    grouped = numeric.groupby(keys)
+    sums = grouped.sum(min_count=1).add_suffix('_sum')
+    counts = grouped.count().add_suffix('_count')
+    rows = grouped.size().rename('rows')
+    return pd.concat([sums, counts, rows], axis=1)
+
+
+def combine_partials(partials):
+    """Add up partial sums/counts and turn them into per-minute means."""
+    partials = [p for p in partials if p is not None and not p.empty]
+    if not partials:
+        return pd.DataFrame()
+    total = pd.concat(partials)
+    total = total.groupby(level=list(range(total.index.nlevels))).sum(min_count=1)
+
+    result = pd.DataFrame({'rows': total['rows']})
+    for column in NUMERIC_COLUMNS:
+        if column + '_sum' in total.columns:
+            result[column] = total[column + '_sum'] / total[column + '_count']
+    return result.sort_index().reset_index()
+
+
+def export_paths(paths, out_dir):
+    """
+    {input path: export path}. Names come from the path relative to the common
+    folder of all inputs; raises ValueError if two inputs still map to the same file.
+    """
+    absolute = [os.path.abspath(p) for p in paths]
+    root = os.path.commonpath([os.path.dirname(p) for p in absolute])
+    exports = {}
+    for path, full in zip(paths, absolute):
+        name = os.path.splitext(os.path.relpath(full, root))[0].replace(os.sep, '__')
+        exports[path] = os.path.join(out_dir, f'{name}_schiphol.csv')
+
+    seen = {}
+    for path, export_path in exports.items():
+        if export_path in seen:
+            raise ValueError(f'{seen[export_path]} and {path} would both be exported to {export_path}')
+        seen[export_path] = path
+    if len(exports) < len(paths):
+        raise ValueError('the same input file is given more than once')
+    return exports
+
+
+def process_file(path, export_path, chunksize=DEFAULT_CHUNKSIZE, radius_km=DEFAULT_RADIUS_KM, by=None):
+    """
+    Stream one CSV through all stages, writing the kept rows to export_path.
+    Returns (path, rows read, rows kept, per-minute partials) so the caller can
+    combine files.
+    """
+    if os.path.exists(export_path):
+        os.remove(export_path)
+
+    partials = []
+    rows_read = rows_kept = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        rows_read += len(chunk)
+        chunk = prepare_tracks(chunk)
+        chunk = chunk[chunk['DistanceToSchiphol'] < radius_km]
+        if chunk.empty:
+            continue
+        rows_kept += len(chunk)
+
+        partials.append(minute_partials(chunk, by))
+        chunk.to_csv(export_path, mode='a', header=not os.path.exists(export_path), index=False)
+
+        # Keep the partials small: fold them once they pile up
+        if len(partials) > 32:
+            partials = [pd.concat(partials).groupby(level=list(range(partials[0].index.nlevels))).sum(min_count=1)]
+
+    return path, rows_read, rows_kept, partials
+
+
+def run(paths, out_dir, chunksize=DEFAULT_CHUNKSIZE, radius_km=DEFAULT_RADIUS_KM, by=None, workers=None):
+    """
+    Process all files in parallel and write the combined per-minute aggregation
+    to <out_dir>/per_minute.csv. Returns (per_minute, counts) with counts a
+    DataFrame of path, export path, rows read and rows kept per file.
+    """
+    exports = export_paths(paths, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(paths)) or 1
+
+    all_partials = []
+    counts = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, p, exports[p], chunksize, radius_km, by) for p in paths]
+        for future in futures:
+            path, rows_read, rows_kept, partials = future.result()
+            counts.append({'path': path, 'export_path': exports[path], 'rows_read': rows_read, 'rows_kept': rows_kept})
+            all_partials.extend(partials)
+
+    per_minute = combine_partials(all_partials)
+    per_minute.to_csv(os.path.join(out_dir, 'per_minute.csv'), index=False)
+    return per_minute, pd.DataFrame(counts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chunked processing of FlightAware track archives.')
+    parser.add_argument('paths', nargs='+', help='FlightAware CSV files')
+    parser.add_argument('--out-dir', default='output')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--radius-km', type=float, default=DEFAULT_RADIUS_KM)
+    parser.add_argument('--by-flight', action='store_true', help='aggregate per minute and per FlightNumber')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    per_minute, counts = run(args.paths, args.out_dir, args.chunksize, args.radius_km,
+                             by=['FlightNumber'] if args.by_flight else None, workers=args.workers)
+    for row in counts.itertuples():
+        print(f'{row.path}: {row.rows_read} rows read, {row.rows_kept} within {args.radius_km} km of Schiphol -> {row.export_path}')
+    print(f"{os.path.join(args.out_dir, 'per_minute.csv')}: {len(per_minute)} rows")
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------------------
+# Shared helpers for FlightAware track CSVs (Vluchten_Schiphol_2_uur.csv,
+# 40_Vluchten.csv, flights_today_master.csv, ...) and Sensornet events.
+# Everything here works on whole columns at once, no row-wise apply.
+# -------------------------------------------------------------------------
+
+# Schiphol coordinates
+SCHIPHOL_LAT = 52.3105
+SCHIPHOL_LON = 4.7683
+
+EARTH_RADIUS_KM = 6371
+
+# The FlightAware pages were scraped with the browser in this timezone
+FLIGHTAWARE_TZ = 'Etc/GMT+3'
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in km (scalars or numpy arrays)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def local_xy(lat, lon):
+    """Local flat projection in metres around Schiphol (fine within ~50 km)."""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    x = np.radians(lon - SCHIPHOL_LON) * np.cos(np.radians(SCHIPHOL_LAT)) * EARTH_RADIUS_KM * 1000
+    y = np.radians(lat - SCHIPHOL_LAT) * EARTH_RADIUS_KM * 1000
+    return x, y
+
+
+def parse_course(course):
+    """'→ 95°' -> 95.0 (the Course column is text in the scraped CSVs)."""
+    # Test for numeric rather than object: on pandas 3 text columns have the 'str' dtype
+    if pd.api.types.is_numeric_dtype(course):
+        return course.astype(float)
+    return course.astype('string').str.extract(r'(\d+)', expand=False).astype(float)
+
+
+def parse_flightaware_time(tracks, tz=FLIGHTAWARE_TZ):
+    """
+    Build a UTC timestamp from 'Time' ("Mon 07:13:52 AM") and the date of 'ScrapeTime'.
+    Points that come out later than the scrape itself happened the day before.
+    """
+    time_part = pd.to_datetime(tracks['Time'].str[4:].str.strip(), format='%I:%M:%S %p', errors='coerce')
+    scrape = pd.to_datetime(tracks['ScrapeTime'], errors='coerce')
+    local = scrape.dt.normalize() + (time_part - time_part.dt.normalize())
+    local = local.where(local <= scrape, local - pd.Timedelta(days=1))
+    return local.dt.tz_localize(tz).dt.tz_convert('UTC').dt.tz_localize(None)
+
+
+def prepare_tracks(tracks):
+    """
+    Normalize a raw FlightAware frame: UTC 'time', numeric 'Course',
+    altitude and climb rate, and the distance to Schiphol in km.
+    """
+    tracks = tracks.copy()
+    tracks['time'] = parse_flightaware_time(tracks)
+    tracks['Course'] = parse_course(tracks['Course'])
+    for column in ['Altitude_feet', 'ClimbRate']:  # "3,047" is text in the CSVs
+        if column in tracks.columns and not pd.api.types.is_numeric_dtype(tracks[column]):
+            text = tracks[column].astype('string').str.replace(',', '')
+            tracks[column] = pd.to_numeric(text, errors='coerce').astype(float)
+    tracks['DistanceToSchiphol'] = haversine_km(
+        SCHIPHOL_LAT, SCHIPHOL_LON, tracks['Latitude'].to_numpy(), tracks['Longitude'].to_numpy()
+    )
+    return tracks
+
+
+def load_tracks(path):
+    return prepare_tracks(pd.read_csv(path))
+
+
+def load_events(path, tz='Europe/Amsterdam'):
+    """
+    Sensornet events saved to CSV (e.g. my_data.csv). The saved times are
+    local Amsterdam time; 'time' is returned as naive UTC like the API gives it.
+    """
+    events = pd.read_csv(path)
+    events['time'] = pd.to_datetime(events['time'], errors='coerce')
+    if tz is not None:
+        events['time'] = events['time'].dt.tz_localize(tz).dt.tz_convert('UTC').dt.tz_localize(None)
+    return events
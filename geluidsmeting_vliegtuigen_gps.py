@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import pandas as pd
 import folium
@@ -5,22 +6,101 @@ import math
 from datetime import datetime
 import pytz
 from folium.plugins import AntPath
-from streamlit_folium import folium_static
+from streamlit_folium import folium_static, st_folium
+from flight_tracks import prepare_tracks
+from noise_grid import estimate_noise_grid, add_noise_overlay
+from replay import build_replay, step_for_time, frame, MAX_GAP_S
+from runway_assignment import assign_runways
+from query_service import QueryClient, QUERY_SERVICE_URL
+from shared_cache import shared_cache
+
+# Schiphol coordinates
+SCHIPHOL_LAT = 52.3105
+SCHIPHOL_LON = 4.7683
+
+# Box of ~20 km around Schiphol: (min_lat, min_lon, max_lat, max_lon)
+SCHIPHOL_BBOX = (SCHIPHOL_LAT - 0.18, SCHIPHOL_LON - 0.295, SCHIPHOL_LAT + 0.18, SCHIPHOL_LON + 0.295)
+
+# Flights shown on the map
+flight_numbers = ["KLM1342", "PGT1259"]
+
+# Set SCHIPHOL_QUERY_URL (e.g. http://127.0.0.1:8765, started with query_service.py)
+# to pull only what this page shows from the local query service instead of
+# reading the full CSVs into this process.
+
+# The overlay and runway assignment only use tracks/events this close in time
+# to the shown flights, so what is pulled doesn't grow with the archive
+ANALYSIS_MARGIN = pd.Timedelta(hours=3)
 
 # -------------------------------------------------------------------------
-# 1) READ CSVs WITH STREAMLIT CACHE
+# 1) READ CSVs (OR QUERY THE SERVICE) WITH STREAMLIT CACHE
 # -------------------------------------------------------------------------
 @st.cache_data
 def load_data():
+    if QUERY_SERVICE_URL:
+        client = QueryClient(QUERY_SERVICE_URL)
+        df = pd.concat([client.tracks(callsign=fn) for fn in flight_numbers], ignore_index=True)
+        sensornet = pd.concat([client.events(callsign=fn) for fn in flight_numbers], ignore_index=True)
+        # The service returns UTC; the rest of this script expects the CSV's Amsterdam local time
+        sensornet['time'] = (
+            sensornet['time'].dt.tz_localize('UTC').dt.tz_convert('Europe/Amsterdam')
+            .dt.tz_localize(None).dt.strftime('%Y-%m-%d %H:%M:%S')
+        )
+        return df, sensornet
     df = pd.read_csv('flights_today_master.csv')   # Flight data (has the coordinates)
     sensornet = pd.read_csv('my_data.csv')           # Sensor data (includes 'time', 'callsign', 'type', 'distance', 'lasmax_dB', etc.)
     return df, sensornet
 
-df, sensornet = load_data()
+def analysis_window():
+    """[start, end) in UTC around the shown flights' tracks (± ANALYSIS_MARGIN), or None without tracks."""
+    shown = prepare_tracks(load_data()[0])
+    times = shown.loc[shown['FlightNumber'].isin(flight_numbers), 'time'].dropna()
+    if times.empty:
+        return None
+    return times.min() - ANALYSIS_MARGIN, times.max() + ANALYSIS_MARGIN
 
-# Schiphol coordinates
-SCHIPHOL_LAT = 52.3105
-SCHIPHOL_LON = 4.7683
+def load_area_tracks(start, end):
+    """All prepared tracks in the 20 km box within [start, end) UTC, for the overlay and replay."""
+    if QUERY_SERVICE_URL:
+        tracks = QueryClient(QUERY_SERVICE_URL).tracks(start=str(start), end=str(end), bbox=SCHIPHOL_BBOX)
+        return prepare_tracks(tracks)
+    tracks = prepare_tracks(load_data()[0])  # untouched copy (Time not yet reduced to HH:MM:SS)
+    return tracks[(tracks['time'] >= start) & (tracks['time'] < end)]
+
+def load_analysis_tracks():
+    """load_area_tracks over the analysis window (empty without tracks of the shown flights)."""
+    window = analysis_window()
+    if window is None:
+        return prepare_tracks(load_data()[0]).iloc[:0]
+    return load_area_tracks(*window)
+
+def load_area_events(columns):
+    """Only the requested sensor event columns within the analysis window, e.g. for calibration."""
+    window = analysis_window()
+    if window is None:
+        return load_data()[1][columns].iloc[:0]
+    start, end = window
+    if QUERY_SERVICE_URL:
+        return QueryClient(QUERY_SERVICE_URL).events(columns=columns, start=str(start), end=str(end))
+    events = load_data()[1]
+    times = (
+        pd.to_datetime(events['time'], errors='coerce')
+        .dt.tz_localize('Europe/Amsterdam').dt.tz_convert('UTC').dt.tz_localize(None)
+    )
+    return events.loc[(times >= start) & (times < end), columns]
+
+def data_source():
+    """
+    What the derived datasets below are computed from: the service URL plus
+    its /stats (row counts and time range, which change when it is restarted on
+    another archive), or the CSV modification times. Part of the shared_cache
+    key, so new data never gets an old grid/replay from the disk cache.
+    """
+    if QUERY_SERVICE_URL:
+        return QUERY_SERVICE_URL, QueryClient(QUERY_SERVICE_URL).stats()
+    return tuple(os.path.getmtime(p) for p in ('flights_today_master.csv', 'my_data.csv'))
+
+df, sensornet = load_data()
 
 # -------------------------------------------------------------------------
 # 2) PARSE & TIMEZONE NORMALIZE
@@ -160,10 +240,29 @@ folium.Circle(
     fill_opacity=0
 ).add_to(m)
 
+# -------------------------------------------------------------------------
+# 5b) OPTIONAL NOISE FOOTPRINT (Lmax / SEL grid from all track points,
+#     calibrated on the sensor events) AS A RASTER OVERLAY
+# -------------------------------------------------------------------------
+# (st.cache_data in this process, shared_cache on disk shared with the other replicas/apps)
+@st.cache_data
+@shared_cache('noise_grid')
+def compute_noise_grid(metric, source):
+    return estimate_noise_grid(load_analysis_tracks(), load_area_events(['lasmax_dB', 'distance']), metric=metric)
+
+noise_metric = st.sidebar.selectbox("Noise footprint", ["None", "Lmax", "SEL"])
+if noise_metric != "None":
+    noise_grid = compute_noise_grid(noise_metric.lower(), data_source())
+    add_noise_overlay(noise_grid, m)
+    calibration = noise_grid['calibration']
+    st.sidebar.caption(
+        f"Calibrated on {calibration['events']} sensor events "
+        f"(L_ref {calibration['l_ref']:.1f} dB, RMSE {calibration['rmse']:.1f} dB)"
+    )
+
 # -------------------------------------------------------------------------
 # 6) DEFINE FLIGHTS + COLORS, PLOT THEIR PATHS
 # -------------------------------------------------------------------------
-flight_numbers = ["KLM1342", "PGT1259"]
 colors = ["blue", "red"]
 for fn, col in zip(flight_numbers, colors):
     sub_df = df[df['FlightNumber'] == fn].copy()
@@ -318,3 +417,98 @@ m.get_root().html.add_child(folium.Element(legend_html))
 # 10) DISPLAY THE MAP IN STREAMLIT
 # -------------------------------------------------------------------------
 folium_static(m)
+
+# -------------------------------------------------------------------------
+# 11) REPLAY MODE: SCRUB THROUGH TIME WITH A SLIDER
+#     All flights within 20 km are pre-interpolated to one position per
+#     second (cached). The section is a fragment: a slider tick reruns only
+#     this part (not the parsing and the map above), looks up one frame and
+#     sends just the aircraft layer onto the cached base map.
+#     Limit: st_folium replaces feature_group_to_add as a whole on the client,
+#     it has no per-marker update, so every tick still sends all visible
+#     aircraft (one small CircleMarker each), not only the ones that moved.
+# -------------------------------------------------------------------------
+st.header("Replay")
+
+@st.cache_data
+@shared_cache('replay_frames')
+def compute_replay(source, window_minutes=60):
+    _, raw_sensornet = load_data()
+    shown_events = raw_sensornet[raw_sensornet['callsign'].isin(flight_numbers)]
+    sensor_times = (
+        pd.to_datetime(shown_events['time'], errors='coerce')
+        .dt.tz_localize('Europe/Amsterdam').dt.tz_convert('UTC').dt.tz_localize(None)
+    )
+    # One hour centred on the first sensor event of the shown flights (else their first track point)
+    half = pd.Timedelta(minutes=window_minutes / 2)
+    if sensor_times.notna().any():
+        centre = sensor_times.min()
+    else:
+        window = analysis_window()
+        if window is None:
+            return None, sensor_times
+        centre = window[0] + ANALYSIS_MARGIN
+    # Only that window is loaded, padded so flights already airborne at its edges interpolate too
+    pad = pd.Timedelta(seconds=MAX_GAP_S)
+    tracks = load_area_tracks(centre - half - pad, centre + half + pad)
+    replay = build_replay(tracks, centre - half, centre + half, radius_km=20)
+    return replay, sensor_times
+
+@st.cache_resource
+def replay_base_map():
+    base = folium.Map(location=[SCHIPHOL_LAT, SCHIPHOL_LON], zoom_start=11)
+    folium.Circle(location=[SCHIPHOL_LAT, SCHIPHOL_LON], radius=20000, color='lightgray', fill=False).add_to(base)
+    for name, lat, lon in sensors:
+        folium.Marker(location=[lat, lon], popup=f"Sensor: {name}", icon=folium.Icon(color='orange')).add_to(base)
+    return base
+
+@st.cache_data
+@shared_cache('runway_assignment')
+def compute_runways(source):
+    return assign_runways(load_analysis_tracks())
+
+@st.fragment
+def replay_section():
+    replay, sensor_times = compute_replay(data_source())
+    runways = compute_runways(data_source())
+    runway_of_flight = dict(zip(runways['FlightNumber'], runways['tag']))
+    if replay is None or len(replay['flights']) == 0:
+        st.info("No flights within 20 km of Schiphol in the replay window.")
+        return
+
+    step = st.slider(
+        "Time (UTC)", 0, len(replay['times']) - 1,
+        value=step_for_time(replay, sensor_times.min()) if sensor_times.notna().any() else 0,
+        format="%d s"
+    )
+    st.caption(f"{replay['times'][step]:%H:%M:%S} UTC")
+
+    # Filter the aircraft on assigned runway and direction (e.g. Zwanenburgbaan36C_L)
+    runway_options = sorted(runways['tag'].dropna().unique())
+    selected_runways = st.multiselect("Runway", runway_options, default=runway_options)
+
+    aircraft_layer = folium.FeatureGroup(name="Aircraft")
+    for row in frame(replay, step).itertuples():
+        flight, alt = row.FlightNumber, row.Altitude_feet
+        runway_tag = runway_of_flight.get(flight)
+        if isinstance(runway_tag, str) and runway_tag not in selected_runways:
+            continue  # flights without an assigned runway stay visible
+        folium.CircleMarker(
+            location=[row.Latitude, row.Longitude],
+            radius=5,
+            color=colors[flight_numbers.index(flight)] if flight in flight_numbers else 'gray',
+            fill=True,
+            fill_opacity=0.9,
+            tooltip=f"{flight} ({alt:.0f} ft, {runway_tag if isinstance(runway_tag, str) else 'runway unknown'})" if pd.notnull(alt) else flight
+        ).add_to(aircraft_layer)
+
+    st_folium(
+        replay_base_map(),
+        feature_group_to_add=aircraft_layer,
+        key="replay_map",
+        height=500,
+        width=None,
+        returned_objects=[]
+    )
+
+replay_section()
@@ -1,14 +1,18 @@
 import streamlit as st
 import requests
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from shared_cache import shared_cache
+from scenario_sweep import build_scenario_cube, slice_events, CABIN_CONFIGURATIONS
+
+SENSORNET_URL = 'https://sensornet.nl/dataserver3/event/collection/nina_events/stream?conditions%5B0%5D%5B%5D=time&conditions%5B0%5D%5B%5D=%3E%3D&conditions%5B0%5D%5B%5D=1735689600&conditions%5B1%5D%5B%5D=time&conditions%5B1%5D%5B%5D=%3C&conditions%5B1%5D%5B%5D=1742774400&conditions%5B%5D%5B%5D=label&conditions%5B%5D%5B%5D=in&conditions%5B%5D%5B%5D=21&conditions%5B%5D%5B%5D=32&conditions%5B%5D%5B%5D=33&conditions%5B%5D%5B%5D=34&args%5B%5D=aalsmeer&args%5B%5D=schiphol&fields%5B%5D=time&fields%5B%5D=location_short&fields%5B%5D=location_long&fields%5B%5D=duration&fields%5B%5D=SEL&fields%5B%5D=SELd&fields%5B%5D=SELe&fields%5B%5D=SELn&fields%5B%5D=SELden&fields%5B%5D=SEL_dB&fields%5B%5D=lasmax_dB&fields%5B%5D=callsign&fields%5B%5D=type&fields%5B%5D=altitude&fields%5B%5D=distance&fields%5B%5D=winddirection&fields%5B%5D=windspeed&fields%5B%5D=label&fields%5B%5D=hex_s&fields%5B%5D=registration&fields%5B%5D=icao_type&fields%5B%5D=serial&fields%5B%5D=operator&fields%5B%5D=tags'
 
 # Cache de gegevensophaal functie om onnodige herhalingen van verzoeken te voorkomen
+# (st.cache_data in dit proces, shared_cache op schijf gedeeld met de andere apps)
 @st.cache_data
-def fetch_data():
-    url = 'https://sensornet.nl/dataserver3/event/collection/nina_events/stream?conditions%5B0%5D%5B%5D=time&conditions%5B0%5D%5B%5D=%3E%3D&conditions%5B0%5D%5B%5D=1735689600&conditions%5B1%5D%5B%5D=time&conditions%5B1%5D%5B%5D=%3C&conditions%5B1%5D%5B%5D=1742774400&conditions%5B%5D%5B%5D=label&conditions%5B%5D%5B%5D=in&conditions%5B%5D%5B%5D=21&conditions%5B%5D%5B%5D=32&conditions%5B%5D%5B%5D=33&conditions%5B%5D%5B%5D=34&args%5B%5D=aalsmeer&args%5B%5D=schiphol&fields%5B%5D=time&fields%5B%5D=location_short&fields%5B%5D=location_long&fields%5B%5D=duration&fields%5B%5D=SEL&fields%5B%5D=SELd&fields%5B%5D=SELe&fields%5B%5D=SELn&fields%5B%5D=SELden&fields%5B%5D=SEL_dB&fields%5B%5D=lasmax_dB&fields%5B%5D=callsign&fields%5B%5D=type&fields%5B%5D=altitude&fields%5B%5D=distance&fields%5B%5D=winddirection&fields%5B%5D=windspeed&fields%5B%5D=label&fields%5B%5D=hex_s&fields%5B%5D=registration&fields%5B%5D=icao_type&fields%5B%5D=serial&fields%5B%5D=operator&fields%5B%5D=tags'
+@shared_cache('sensornet_events')
+def fetch_data(url=SENSORNET_URL):
     
     try:
         response = requests.get(url)
@@ -26,6 +30,18 @@ def fetch_data():
     except requests.exceptions.RequestException:
         return None  # Als er een netwerkfout of andere fout is, geef dan ook geen data terug
 
+# Met de lokale query service (SCHIPHOL_QUERY_URL) alleen de benodigde kolommen van de periode ophalen
+# en het gemiddelde per type door de service (/rollup) laten uitrekenen
+SERVICE_KOLOMMEN = ['time', 'type', 'SEL_dB', 'distance', 'altitude']
+
+@st.cache_data
+def haal_service_events(url, start='2025-01-01', end='2025-03-24'):
+    return QueryClient(url).events(start=start, end=end, columns=SERVICE_KOLOMMEN)
+
+@st.cache_data
+def haal_service_rollup(url, start='2025-01-01', end='2025-03-24'):
+    return QueryClient(url).sel_rollup(by='type', start=start, end=end)
+
 # Mockdata voor 10 vliegtuigen
 def get_mock_data():
     data = pd.DataFrame({
@@ -37,30 +53,14 @@ def get_mock_data():
     })
     return data
 
-# Cache de berekeningen van geluid per passagier en vracht
+# Cache de scenario-kubus: alle events in één keer tegen alle load factors en cabine-indelingen
 @st.cache_data
-def bereken_geluid_per_passagier_en_vracht(data, vliegtuig_capaciteit, load_factor):
-    results = []
-
-    for _, row in data.iterrows():
-        vliegtuig_type = row['vliegtuig_type']
-        if vliegtuig_type in vliegtuig_capaciteit:
-            sel_dB = row['SEL_dB']
-            passagiers = vliegtuig_capaciteit[vliegtuig_type]['passagiers']
-            vracht_ton = vliegtuig_capaciteit[vliegtuig_type]['vracht_ton']
-            
-            passagiers_bezet = passagiers * load_factor
-            geluid_per_passagier = sel_dB / passagiers_bezet if passagiers_bezet != 0 else np.nan
-            geluid_per_vracht = sel_dB / vracht_ton if vracht_ton != 0 else np.nan
-            
-            results.append({
-                'vliegtuig_type': vliegtuig_type,
-                'passagiers': passagiers,
-                'geluid_per_passagier': geluid_per_passagier,
-                'geluid_per_vracht': geluid_per_vracht
-            })
-
-    return pd.DataFrame(results)
+@shared_cache('geluid_scenario_kubus', version='2')
+def bereken_geluid_scenarios(data, vliegtuig_capaciteit, type_kolom):
+    return build_scenario_cube(
+        data, vliegtuig_capaciteit, type_col=type_kolom,
+        passengers_key='passagiers', cargo_key='vracht_ton'
+    )
 
 # Stel vliegtuigcapaciteit in
 vliegtuig_capaciteit = {
@@ -76,21 +76,29 @@ vliegtuig_capaciteit = {
     'Boeing 787-9': {'passagiers': 296, 'vracht_ton': 45}  # Toegevoegd vliegtuigtype
 }
 
-# Stel de load factor in (85% van de capaciteit)
-load_factor = 0.85
-
 # Streamlit UI
 st.title('Geluid per Passagier en Vracht per Vliegtuigtype')
 st.markdown('Deze applicatie berekent en toont het geluid per passagier en per ton vracht voor verschillende vliegtuigtypes, gebaseerd op gegevens uit de luchtvaart. Hieronder zijn de grafieken van de top 10 meest gebruikte vliegtuigen')
 
-# Haal de gegevens op van de API of gebruik mockdata
-data = fetch_data()
+# Stel de load factor (standaard 85% van de capaciteit) en de cabine-indeling in
+load_factor = st.slider('Load factor', 0.5, 1.0, 0.85, 0.05)
+cabine_indeling = st.selectbox('Cabine-indeling', list(CABIN_CONFIGURATIONS))
+
+# Haal de gegevens op van de API (of de query service) of gebruik mockdata
+data = haal_service_events(QUERY_SERVICE_URL) if QUERY_SERVICE_URL else fetch_data()
 
-if data is None:
+if data is None or data.empty:
     data = get_mock_data()  # Gebruik mockdata als de API niet werkt
 
-# Voer de berekeningen uit
-resultaten = bereken_geluid_per_passagier_en_vracht(data, vliegtuig_capaciteit, load_factor)
+# Voer de berekeningen uit (één keer per dataset); de sliders snijden alleen in de kubus
+type_kolom = 'vliegtuig_type' if 'vliegtuig_type' in data.columns else 'type'
+scenarios = bereken_geluid_scenarios(data, vliegtuig_capaciteit, type_kolom)
+resultaten = slice_events(scenarios, load_factor, cabine_indeling).rename(columns={
+    'aircraft_type': 'vliegtuig_type',
+    'passengers': 'passagiers',
+    'noise_per_passenger': 'geluid_per_passagier',
+    'noise_per_cargo': 'geluid_per_vracht',
+})
 
 # Sorteer de resultaten
 resultaten_sorted_passagier = resultaten.sort_values(by='geluid_per_passagier')
@@ -152,6 +160,7 @@ st.pyplot(plt)
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from sel_regression import fit_grouped
 import requests
 
 # Stel de maximale weergave van rijen in voor debugging
@@ -159,9 +168,9 @@ pd.set_option('display.max_rows', 100000)  # Verhoog het aantal weergegeven rije
 
 # Cache de gegevensophaal functie om onnodige herhalingen van verzoeken te voorkomen
 @st.cache_data
-def fetch_data():
-    start_date = int(pd.to_datetime('2025-01-01').timestamp())
-    end_date = int(pd.to_datetime('2025-03-24').timestamp())
+@shared_cache('sensornet_events')
+def fetch_data(start_date=int(pd.to_datetime('2025-01-01').timestamp()),
+               end_date=int(pd.to_datetime('2025-03-24').timestamp())):
     response = requests.get(f'https://sensornet.nl/dataserver3/event/collection/nina_events/stream?conditions%5B0%5D%5B%5D=time&conditions%5B0%5D%5B%5D=%3E%3D&conditions%5B0%5D%5B%5D={start_date}&conditions%5B1%5D%5B%5D=time&conditions%5B1%5D%5B%5D=%3C&conditions%5B1%5D%5B%5D={end_date}&conditions%5B2%5D%5B%5D=label&conditions%5B2%5D%5B%5D=in&conditions%5B2%5D%5B2%5D%5B%5D=21&conditions%5B2%5D%5B2%5D%5B%5D=32&conditions%5B2%5D%5B2%5D%5B%5D=33&conditions%5B2%5D%5B2%5D%5B%5D=34&args%5B%5D=aalsmeer&args%5B%5D=schiphol&fields%5B%5D=time&fields%5B%5D=location_short&fields%5B%5D=location_long&fields%5B%5D=duration&fields%5B%5D=SEL&fields%5B%5D=SELd&fields%5B%5D=SELe&fields%5B%5D=SELn&fields%5B%5D=SELden&fields%5B%5D=SEL_dB&fields%5B%5D=lasmax_dB&fields%5B%5D=callsign&fields%5B%5D=type&fields%5B%5D=altitude&fields%5B%5D=distance&fields%5B%5D=winddirection&fields%5B%5D=windspeed&fields%5B%5D=label&fields%5B%5D=hex_s&fields%5B%5D=registration&fields%5B%5D=icao_type&fields%5B%5D=serial&fields%5B%5D=operator&fields%5B%5D=tags')
     colnames = pd.DataFrame(response.json()['metadata'])
     data = pd.DataFrame(response.json()['rows'])
@@ -170,7 +179,7 @@ def fetch_data():
     return data
 
 # Haal de dataset op
-data = fetch_data()
+data = haal_service_events(QUERY_SERVICE_URL) if QUERY_SERVICE_URL else fetch_data()
 
 # Definieer passagierscategorieën
 def categorize_by_passenger_count(passenger_count):
@@ -249,10 +258,23 @@ else:
     )
 
     # Bereken de gemiddelde SEL_dB per vliegtuigtype
-    average_decibels_by_aircraft = filtered_data.groupby('type').agg(
-        Gemiddeld_SEL_dB=('SEL_dB', 'mean'),
-        Passagiers=('passagiers', 'first')
-    ).reset_index()
+    if QUERY_SERVICE_URL:
+        # De service groepeert op het ruwe type; na het normaliseren gewogen samenvoegen
+        rollup = haal_service_rollup(QUERY_SERVICE_URL)
+        rollup['type'] = rollup['type'].str.strip().str.lower()
+        rollup['SEL_som'] = rollup['mean_SEL_dB'] * rollup['events']
+        rollup = rollup[rollup['type'].isin(vliegtuig_capaciteit_passagiersaantal.keys())]
+        rollup = rollup.groupby('type', as_index=False)[['SEL_som', 'events']].sum()
+        average_decibels_by_aircraft = pd.DataFrame({
+            'type': rollup['type'],
+            'Gemiddeld_SEL_dB': rollup['SEL_som'] / rollup['events'],
+            'Passagiers': rollup['type'].map(lambda x: vliegtuig_capaciteit_passagiersaantal[x]['passagiers']),
+        })
+    else:
+        average_decibels_by_aircraft = filtered_data.groupby('type').agg(
+            Gemiddeld_SEL_dB=('SEL_dB', 'mean'),
+            Passagiers=('passagiers', 'first')
+        ).reset_index()
 
     # Voeg passagierscategorieën toe
     average_decibels_by_aircraft['categorie'] = average_decibels_by_aircraft['Passagiers'].apply(categorize_by_passenger_count)
@@ -364,3 +386,14 @@ fig_weekday_chart.update_layout(
 
 # Toon de chart
 st.plotly_chart(fig_weekday_chart, use_container_width=True, key="weekday_chart")
+
+
+# Regressie: SEL_dB ~ log10(afstand) + hoogte per vliegtuigtype (alle types in één keer)
+st.subheader("Regressie: Geluid (SEL_dB) tegen Afstand en Hoogte per Vliegtuigtype")
+
+@st.cache_data
+def fit_sel_regressie(data):
+    return fit_grouped(data, group_col='type')
+
+regressie = fit_sel_regressie(data)
+st.dataframe(regressie[regressie['n'] >= 10], use_container_width=True)
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------------------
+# Join Sensornet events to OpenSky state vectors on the transponder address
+# (Sensornet 'hex_s' == OpenSky 'icao24') within a time window.
+#
+# pd.merge(sensornet, opensky, on='callsign') gives every event x every state
+# vector of that callsign and also matches unrelated flights that reuse a
+# callsign. Here both tables are split into partitions on a hash of the
+# normalized hex (the same hex lands in the same partition on both sides);
+# only one partition of each table is materialized at a time, and within it
+# merge_asof picks the nearest state vector in time for every event.
+# The result has at most one row per event.
+# -------------------------------------------------------------------------
+DEFAULT_WINDOW_S = 60
+
+
+def normalize_hex(values):
+    """'4690F9 ' / '4690f9' -> '4690f9'; empty strings become NaN."""
+    return values.astype('string').str.strip().str.lower().replace('', pd.NA)
+
+
+def _as_ns(times):
+    """
+    Naive UTC datetime64[ns]. merge_asof needs both keys at the same resolution;
+    on pandas 3 CSV times come in as [us] and epoch seconds as [s].
+    """
+    if getattr(times.dt, 'tz', None) is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times.astype('datetime64[ns]')
+
+
+def _state_times(states, time_col):
+    times = states[time_col]
+    if pd.api.types.is_numeric_dtype(times):
+        return _as_ns(pd.to_datetime(times, unit='s', errors='coerce'))
+    return _as_ns(pd.to_datetime(times, errors='coerce'))
+
+
+def hex_partitions(hexes, partitions):
+    """Partition number per row from a stable hash of the (normalized) hex."""
+    if partitions == 1:
+        return np.zeros(len(hexes), dtype=np.int64)
+    hashed = pd.util.hash_pandas_object(hexes, index=False).to_numpy()
+    return (hashed % np.uint64(partitions)).astype(np.int64)
+
+
+def join_events_to_states(events, states, window_s=DEFAULT_WINDOW_S, how='left', partitions=1,
+                          event_hex='hex_s', state_hex='icao24', event_time='time',
+                          state_time='time_position', suffix='_opensky'):
+    """
+    Best state vector per event: same transponder hex and the smallest |dt|
+    within window_s seconds. Adds 'state_time' and 'match_dt_s' columns.
+
+    how='left' keeps unmatched events (NaN state columns), how='inner' drops them.
+    partitions > 1 joins the hex hash partitions one by one, so only one
+    partition of the state columns is copied at a time.
+    """
+    event_hexes = normalize_hex(events[event_hex])
+    state_hexes = normalize_hex(states[state_hex])
+    event_times = _as_ns(pd.to_datetime(events[event_time], errors='coerce'))
+    state_times = _state_times(states, state_time)
+
+    events_ok = (event_hexes.notna() & event_times.notna()).to_numpy()
+    states_ok = (state_hexes.notna() & state_times.notna()).to_numpy()
+    event_parts = hex_partitions(event_hexes, partitions)
+    state_parts = hex_partitions(state_hexes, partitions)
+
+    state_columns = list(states.columns)
+    renamed = {c: c + suffix for c in state_columns if c in events.columns}
+    tolerance = pd.Timedelta(seconds=window_s)
+
+    matches = []
+    for part in range(partitions):
+        ev_mask = events_ok & (event_parts == part)
+        st_mask = states_ok & (state_parts == part)
+        if not ev_mask.any() or not st_mask.any():
+            continue
+        # Integer codes for the hexes of this partition only
+        n = int(ev_mask.sum())
+        codes, _ = pd.factorize(pd.concat([event_hexes[ev_mask], state_hexes[st_mask]], ignore_index=True))
+        ev = pd.DataFrame({
+            '_row': np.flatnonzero(ev_mask),
+            '_time': event_times[ev_mask].to_numpy(),
+            '_code': codes[:n],
+        })
+        st_ = states.loc[st_mask, state_columns].rename(columns=renamed)
+        st_['state_time'] = state_times[st_mask].to_numpy()
+        st_['_time'] = st_['state_time']
+        st_['_code'] = codes[n:]
+
+        merged = pd.merge_asof(
+            ev.sort_values('_time'), st_.sort_values('_time'),
+            on='_time', by='_code', direction='nearest', tolerance=tolerance,
+        )
+        # '_time' is the normalized event time here, so this also works for tz-aware input
+        merged['match_dt_s'] = (merged['state_time'] - merged['_time']).dt.total_seconds()
+        matches.append(merged.drop(columns=['_time', '_code']))
+
+    if matches:
+        matched = pd.concat(matches, ignore_index=True)
+    else:
+        columns = ['_row'] + [renamed.get(c, c) for c in state_columns] + ['state_time', 'match_dt_s']
+        matched = pd.DataFrame(columns=columns).astype({'_row': np.int64})
+
+    result = events.assign(_row=np.arange(len(events))).merge(matched, on='_row', how='left')
+    result['state_time'] = pd.to_datetime(result['state_time'])
+    result['match_dt_s'] = result['match_dt_s'].astype(float)
+    if how == 'inner':
+        result = result[result['state_time'].notna()]
+    return result.sort_values('_row').drop(columns='_row').reset_index(drop=True)
@@ -0,0 +1,215 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from flight_tracks import SCHIPHOL_LAT, SCHIPHOL_LON, EARTH_RADIUS_KM, local_xy
+
+# -------------------------------------------------------------------------
+# Noise footprint (Lmax / SEL contour grid) around Schiphol, estimated from
+# all ADS-B track points and calibrated on measured Sensornet events.
+#
+# Per track point and grid cell:
+#   L = L_ref - 20*log10(r / R_REF) - alpha * (r - R_REF) / 1000
+# with r the slant distance (horizontal distance + altitude) in metres,
+# spherical spreading and an atmospheric absorption term in dB/km.
+#   Lmax(cell) = max over all points
+#   SEL(cell)  = 10*log10(sum over points of 10^(L/10) * dt)
+# L_ref (and alpha when there are enough events) is fitted on lasmax_dB and
+# distance of the Sensornet events.
+#
+# Grid x points is far too big to do at once, so the grid is cut into chunks
+# that go to a process pool, and every worker walks through the track points
+# in chunks as well. A (chunk_cells x chunk_points) block of float64 is 32 MB
+# with the defaults, and _evaluate_chunk holds about five of them at once
+# (squared offsets, r, the clipped r, the level and its reduction input), so
+# peak memory is ~160 MB per worker. The default worker count is capped at
+# DEFAULT_MAX_WORKERS (~640 MB in total); pass workers= to go higher.
+# -------------------------------------------------------------------------
+R_REF = 300.0           # reference distance in metres
+DEFAULT_L_REF = 85.0    # dB at R_REF, only used without calibration events
+DEFAULT_ALPHA = 5.0     # dB/km atmospheric absorption
+FEET_TO_M = 0.3048
+
+DEFAULT_RADIUS_KM = 20
+DEFAULT_CELL_M = 250
+DEFAULT_CHUNK_CELLS = 1024
+DEFAULT_CHUNK_POINTS = 4096  # 1024 x 4096 x 8 bytes = 32 MB per block, ~5 blocks live per worker
+DEFAULT_MAX_WORKERS = 4
+
+
+def _level(r, l_ref, alpha):
+    r = np.maximum(r, 1.0)
+    return l_ref - 20 * np.log10(r / R_REF) - alpha * (r - R_REF) / 1000
+
+
+# -------------------------------------------------------------------------
+# Calibration
+# -------------------------------------------------------------------------
+def calibrate(events, min_events_for_alpha=10):
+    """
+    Fit L_ref (and alpha) on Sensornet events with 'lasmax_dB' and 'distance'
+    (slant distance in metres). Returns {'l_ref', 'alpha', 'events', 'rmse'}.
+    """
+    data = events[['lasmax_dB', 'distance']].apply(pd.to_numeric, errors='coerce').dropna()
+    data = data[data['distance'] > 0]
+    if data.empty:
+        return {'l_ref': DEFAULT_L_REF, 'alpha': DEFAULT_ALPHA, 'events': 0, 'rmse': np.nan}
+
+    r = data['distance'].to_numpy()
+    # lasmax + spreading = L_ref - alpha * (r - R_REF) / 1000
+    target = data['lasmax_dB'].to_numpy() + 20 * np.log10(r / R_REF)
+    if len(data) >= min_events_for_alpha and np.ptp(r) > 0:
+        X = np.column_stack([np.ones_like(r), -(r - R_REF) / 1000])
+        (l_ref, alpha), *_ = np.linalg.lstsq(X, target, rcond=None)
+        alpha = max(alpha, 0.0)  # negative absorption is not physical
+    else:
+        alpha = DEFAULT_ALPHA
+        l_ref = np.mean(target + alpha * (r - R_REF) / 1000)
+
+    residual = data['lasmax_dB'].to_numpy() - _level(r, l_ref, alpha)
+    return {
+        'l_ref': float(l_ref),
+        'alpha': float(alpha),
+        'events': len(data),
+        'rmse': float(np.sqrt(np.mean(residual ** 2))),
+    }
+
+
+# -------------------------------------------------------------------------
+# Track points
+# -------------------------------------------------------------------------
+def track_points(tracks, max_dt_s=60):
+    """
+    x, y, altitude (m) and dt (s, the time a point represents) for every usable
+    track point. 'tracks' is the output of flight_tracks.prepare_tracks.
+    """
+    points = tracks[['FlightNumber', 'time', 'Latitude', 'Longitude', 'Altitude_feet']].dropna()
+    points = points.sort_values(['FlightNumber', 'time'])
+
+    dt = points.groupby('FlightNumber')['time'].diff().shift(-1).dt.total_seconds()
+    dt = dt.where(points['FlightNumber'].eq(points['FlightNumber'].shift(-1)))
+    dt = dt.fillna(dt.median() if dt.notna().any() else 1.0).clip(1.0, max_dt_s)
+
+    x, y = local_xy(points['Latitude'], points['Longitude'])
+    return np.column_stack([x, y, points['Altitude_feet'].to_numpy() * FEET_TO_M, dt.to_numpy()])
+
+
+# -------------------------------------------------------------------------
+# Chunked evaluation (runs in the worker processes)
+# -------------------------------------------------------------------------
+_POINTS = None
+
+
+def _init_worker(points):
+    global _POINTS
+    _POINTS = points
+
+
+def _evaluate_chunk(args):
+    cell_x, cell_y, l_ref, alpha, metric, chunk_points = args
+    points = _POINTS
+    if metric == 'lmax':
+        result = np.full(len(cell_x), -np.inf)
+    else:
+        result = np.zeros(len(cell_x))
+
+    for start in range(0, len(points), chunk_points):
+        block = points[start:start + chunk_points]
+        r = np.sqrt(
+            (cell_x[:, None] - block[None, :, 0]) ** 2
+            + (cell_y[:, None] - block[None, :, 1]) ** 2
+            + block[None, :, 2] ** 2
+        )
+        level = _level(r, l_ref, alpha)
+        if metric == 'lmax':
+            np.maximum(result, level.max(axis=1), out=result)
+        else:
+            result += (np.power(10.0, level / 10) * block[None, :, 3]).sum(axis=1)
+
+    if metric == 'sel':
+        with np.errstate(divide='ignore'):
+            result = 10 * np.log10(result)
+    return result
+
+
+def estimate_noise_grid(tracks, events=None, metric='lmax', radius_km=DEFAULT_RADIUS_KM,
+                        cell_m=DEFAULT_CELL_M, chunk_cells=DEFAULT_CHUNK_CELLS,
+                        chunk_points=DEFAULT_CHUNK_POINTS, workers=None):
+    """
+    Evaluate an Lmax or SEL grid (dB) around Schiphol.
+
+    Returns a dict with 'values' (2D array, row 0 = southern edge), 'lats',
+    'lons', 'bounds' ([[south, west], [north, east]]), 'metric' and 'calibration'.
+    """
+    if metric not in ('lmax', 'sel'):
+        raise ValueError("metric must be 'lmax' or 'sel'")
+
+    calibration = calibrate(events) if events is not None else {
+        'l_ref': DEFAULT_L_REF, 'alpha': DEFAULT_ALPHA, 'events': 0, 'rmse': np.nan
+    }
+
+    # Grid in metres, converted back to lat/lon for the map
+    half = radius_km * 1000
+    xs = np.arange(-half, half + cell_m, cell_m)
+    ys = np.arange(-half, half + cell_m, cell_m)
+    lons = SCHIPHOL_LON + np.degrees(xs / (EARTH_RADIUS_KM * 1000 * np.cos(np.radians(SCHIPHOL_LAT))))
+    lats = SCHIPHOL_LAT + np.degrees(ys / (EARTH_RADIUS_KM * 1000))
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    cell_x, cell_y = grid_x.ravel(), grid_y.ravel()
+
+    # Points far outside the grid contribute nothing visible
+    points = track_points(tracks)
+    reach = half + 10_000
+    points = points[(np.abs(points[:, 0]) < reach) & (np.abs(points[:, 1]) < reach)]
+
+    if len(points) == 0:
+        values = np.full(len(cell_x), np.nan)
+    else:
+        tasks = [
+            (cell_x[i:i + chunk_cells], cell_y[i:i + chunk_cells],
+             calibration['l_ref'], calibration['alpha'], metric, chunk_points)
+            for i in range(0, len(cell_x), chunk_cells)
+        ]
+        workers = workers or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+        if workers == 1:
+            _init_worker(points)
+            values = np.concatenate([_evaluate_chunk(t) for t in tasks])
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(points,)) as pool:
+                values = np.concatenate(list(pool.map(_evaluate_chunk, tasks)))
+
+    return {
+        'values': values.reshape(grid_x.shape),
+        'lats': lats,
+        'lons': lons,
+        'bounds': [[lats[0], lons[0]], [lats[-1], lons[-1]]],
+        'metric': metric,
+        'calibration': calibration,
+    }
+
+
+# -------------------------------------------------------------------------
+# Map overlay
+# -------------------------------------------------------------------------
+def grid_to_rgba(grid, vmin=45, vmax=85, cmap='inferno_r', opacity=0.55):
+    """Colour the grid; cells below vmin are transparent."""
+    import matplotlib
+
+    values = grid['values']
+    normed = np.clip((values - vmin) / (vmax - vmin), 0, 1)
+    rgba = matplotlib.colormaps[cmap](normed)
+    rgba[..., 3] = np.where(np.isfinite(values) & (values >= vmin), opacity, 0)
+    return rgba
+
+
+def add_noise_overlay(grid, map_obj, vmin=45, vmax=85, cmap='inferno_r', opacity=0.55, name=None):
+    """Put the grid on a folium map as an image overlay."""
+    import folium
+
+    folium.raster_layers.ImageOverlay(
+        image=grid_to_rgba(grid, vmin, vmax, cmap, opacity),
+        bounds=grid['bounds'],
+        origin='lower',
+        name=name or f"{grid['metric'].upper()} (dB)",
+    ).add_to(map_obj)
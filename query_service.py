@@ -0,0 +1,340 @@
+import os
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+import requests
+
+from flight_tracks import load_tracks, load_events
+
+# -------------------------------------------------------------------------
+# Small local query service over the track (FlightAware/OpenSky) and
+# event (Sensornet) tables.
+#
+# The tables are loaded once, sorted by time and indexed on:
+#   - time      (sorted array -> binary search)
+#   - callsign  (callsign -> row positions)
+#   - location  (Sensornet location_short -> row positions)
+#   - bbox      (lat/lon grid cell -> row positions)
+# Responses are columnar ({column: [values]}) and paginated, so a dashboard
+# only pulls the rows it actually shows.
+#
+# Run it with:
+#   python query_service.py --tracks Vluchten_Schiphol_2_uur.csv --events my_data.csv
+# and query it from any app with QueryClient(). The apps switch to the service
+# when SCHIPHOL_QUERY_URL is set (e.g. http://127.0.0.1:8765).
+# -------------------------------------------------------------------------
+QUERY_SERVICE_URL = os.environ.get('SCHIPHOL_QUERY_URL')
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 5000
+GRID_CELL_DEG = 0.05  # ~5 km cells for the bbox index
+
+
+def _positions_index(values):
+    """{value: sorted array of row positions} in one pass (no Python loop over rows)."""
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {
+        key: order[bounds[i]:bounds[i + 1]]
+        for i, key in enumerate(uniques)
+    }
+
+
+def _time_window(times, positions, start, end):
+    """Keep the positions whose time lies in [start, end); times must be sorted."""
+    t = times[positions]
+    lo = 0 if start is None else np.searchsorted(t, np.datetime64(pd.Timestamp(start)), side='left')
+    hi = len(t) if end is None else np.searchsorted(t, np.datetime64(pd.Timestamp(end)), side='left')
+    return positions[lo:hi]
+
+
+def to_columnar(frame):
+    """DataFrame -> {column: list}, JSON safe (timestamps as ISO strings, NaN as None)."""
+    columns = {}
+    for name, col in frame.items():
+        if pd.api.types.is_datetime64_any_dtype(col):
+            values = col.dt.strftime('%Y-%m-%dT%H:%M:%S').where(col.notna(), None)
+        else:
+            values = col.astype(object).where(col.notna(), None)
+        columns[name] = values.tolist()
+    return columns
+
+
+def _paginate(frame, page, page_size):
+    total = len(frame)
+    start = page * page_size
+    chunk = frame.iloc[start:start + page_size]
+    return {
+        'columns': to_columnar(chunk),
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'next_page': page + 1 if start + page_size < total else None,
+    }
+
+
+class TrackEventStore:
+    """
+    In-memory indexed copy of the track and event tables.
+    'tracks' needs time, FlightNumber, Latitude, Longitude; 'events' needs
+    time, callsign, location_short, SEL_dB (the Sensornet columns).
+    """
+
+    def __init__(self, tracks, events, cell_deg=GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+
+        self.tracks = tracks.sort_values('time', kind='stable').reset_index(drop=True)
+        self.track_times = self.tracks['time'].to_numpy()
+        self.track_callsign_index = _positions_index(self.tracks['FlightNumber'].to_numpy())
+        self.track_cell_index = _positions_index(self._cells(
+            self.tracks['Latitude'].to_numpy(), self.tracks['Longitude'].to_numpy()
+        ))
+
+        self.events = events.sort_values('time', kind='stable').reset_index(drop=True)
+        self.event_times = self.events['time'].to_numpy()
+        self.event_callsign_index = _positions_index(self.events['callsign'].to_numpy())
+        self.event_location_index = _positions_index(self.events['location_short'].to_numpy())
+
+    def _cells(self, lat, lon):
+        # One integer key per grid cell; NaN coordinates end up in a cell no bbox reaches
+        iy = np.floor(np.nan_to_num(lat, nan=-1e6) / self.cell_deg).astype(np.int64)
+        ix = np.floor(np.nan_to_num(lon, nan=-1e6) / self.cell_deg).astype(np.int64)
+        return iy * 1_000_000 + ix
+
+    def _bbox_positions(self, bbox):
+        min_lat, min_lon, max_lat, max_lon = bbox
+        iys = np.arange(np.floor(min_lat / self.cell_deg), np.floor(max_lat / self.cell_deg) + 1).astype(np.int64)
+        ixs = np.arange(np.floor(min_lon / self.cell_deg), np.floor(max_lon / self.cell_deg) + 1).astype(np.int64)
+        keys = (iys[:, None] * 1_000_000 + ixs[None, :]).ravel()
+        found = [self.track_cell_index[k] for k in keys if k in self.track_cell_index]
+        if not found:
+            return np.array([], dtype=np.int64)
+        positions = np.sort(np.concatenate(found))
+
+        # Cells are coarse; cut the exact box
+        lat = self.tracks['Latitude'].to_numpy()[positions]
+        lon = self.tracks['Longitude'].to_numpy()[positions]
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return positions[inside]
+
+    def stats(self):
+        """
+        Row counts and time range of both tables. Clients use this as a data
+        version, e.g. in cache keys, to notice a restart on another archive.
+        """
+        def describe(frame, times):
+            valid = times[~np.isnat(times)]
+            return {
+                'rows': len(frame),
+                'first': str(valid.min()) if len(valid) else None,
+                'last': str(valid.max()) if len(valid) else None,
+            }
+        return {'tracks': describe(self.tracks, self.track_times), 'events': describe(self.events, self.event_times)}
+
+    # ---------------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------------
+    def track_rows(self, callsign=None, start=None, end=None, bbox=None):
+        if callsign is not None:
+            positions = self.track_callsign_index.get(callsign, np.array([], dtype=np.int64))
+        elif bbox is not None:
+            positions = self._bbox_positions(bbox)
+            bbox = None  # already applied
+        else:
+            positions = np.arange(len(self.tracks))
+        positions = _time_window(self.track_times, positions, start, end)
+
+        if bbox is not None:
+            lat = self.tracks['Latitude'].to_numpy()[positions]
+            lon = self.tracks['Longitude'].to_numpy()[positions]
+            min_lat, min_lon, max_lat, max_lon = bbox
+            positions = positions[(lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)]
+        return self.tracks.iloc[positions]
+
+    def event_rows(self, location=None, callsign=None, start=None, end=None):
+        if location is not None:
+            positions = self.event_location_index.get(location, np.array([], dtype=np.int64))
+            if callsign is not None:
+                positions = np.intersect1d(positions, self.event_callsign_index.get(callsign, []))
+        elif callsign is not None:
+            positions = self.event_callsign_index.get(callsign, np.array([], dtype=np.int64))
+        else:
+            positions = np.arange(len(self.events))
+        positions = _time_window(self.event_times, positions.astype(np.int64), start, end)
+        return self.events.iloc[positions]
+
+    def tracks_page(self, callsign=None, start=None, end=None, bbox=None, columns=None,
+                    page=0, page_size=DEFAULT_PAGE_SIZE):
+        rows = self.track_rows(callsign, start, end, bbox)
+        return _paginate(rows[columns] if columns else rows, page, page_size)
+
+    def events_page(self, location=None, callsign=None, start=None, end=None, columns=None,
+                    page=0, page_size=DEFAULT_PAGE_SIZE):
+        rows = self.event_rows(location, callsign, start, end)
+        return _paginate(rows[columns] if columns else rows, page, page_size)
+
+    def sel_rollup(self, by='type', location=None, start=None, end=None, page=0, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Per-group SEL statistics: number of events, arithmetic mean SEL_dB and the
+        energy average (10*log10(mean(10^(SEL/10)))), which is what dB values add up to.
+        """
+        rows = self.event_rows(location=location, start=start, end=end)
+        sel = rows['SEL_dB'].astype(float)
+        grouped = pd.DataFrame({
+            by: rows[by].fillna('Onbekend'),
+            'SEL_dB': sel,
+            'energy': np.power(10.0, sel / 10),
+        }).groupby(by)
+        rollup = grouped.agg(
+            events=('SEL_dB', 'count'),
+            mean_SEL_dB=('SEL_dB', 'mean'),
+            max_SEL_dB=('SEL_dB', 'max'),
+            energy=('energy', 'mean'),
+        ).reset_index()
+        rollup['energy_avg_SEL_dB'] = 10 * np.log10(rollup.pop('energy'))
+        rollup = rollup.sort_values('events', ascending=False)
+        return _paginate(rollup, page, page_size)
+
+
+# -------------------------------------------------------------------------
+# HTTP layer (stdlib only): GET /tracks, /events, /rollup, /stats
+# -------------------------------------------------------------------------
+def _arg(params, name, cast=str, default=None):
+    values = params.get(name)
+    return cast(values[0]) if values else default
+
+
+def _bbox_arg(params):
+    value = _arg(params, 'bbox')
+    return tuple(float(v) for v in value.split(',')) if value else None
+
+
+def _columns_arg(params):
+    value = _arg(params, 'columns')
+    return value.split(',') if value else None
+
+
+def make_handler(store):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            paging = {
+                'page': _arg(params, 'page', int, 0),
+                'page_size': _arg(params, 'page_size', int, DEFAULT_PAGE_SIZE),
+            }
+            try:
+                if url.path == '/tracks':
+                    body = store.tracks_page(
+                        callsign=_arg(params, 'callsign'), start=_arg(params, 'start'),
+                        end=_arg(params, 'end'), bbox=_bbox_arg(params),
+                        columns=_columns_arg(params), **paging
+                    )
+                elif url.path == '/events':
+                    body = store.events_page(
+                        location=_arg(params, 'location'), callsign=_arg(params, 'callsign'),
+                        start=_arg(params, 'start'), end=_arg(params, 'end'),
+                        columns=_columns_arg(params), **paging
+                    )
+                elif url.path == '/rollup':
+                    body = store.sel_rollup(
+                        by=_arg(params, 'by', default='type'), location=_arg(params, 'location'),
+                        start=_arg(params, 'start'), end=_arg(params, 'end'), **paging
+                    )
+                elif url.path == '/stats':
+                    body = store.stats()
+                else:
+                    self._send(404, {'error': f'unknown endpoint {url.path}'})
+                    return
+            except (KeyError, ValueError) as e:
+                self._send(400, {'error': str(e)})
+                return
+            self._send(200, body)
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # keep the terminal quiet
+
+    return QueryHandler
+
+
+def serve(store, host='127.0.0.1', port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    print(f'Query service on http://{host}:{port} (tracks: {len(store.tracks)}, events: {len(store.events)})')
+    server.serve_forever()
+
+
+class QueryClient:
+    """
+    Client for the Streamlit apps. Every method follows next_page until
+    'limit' rows are collected and returns a DataFrame.
+    """
+
+    def __init__(self, base_url=f'http://127.0.0.1:{DEFAULT_PORT}', page_size=DEFAULT_PAGE_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+
+    def _get(self, endpoint, params, limit=None):
+        params = {k: v for k, v in params.items() if v is not None}
+        frames = []
+        page, rows = 0, 0
+        while page is not None and (limit is None or rows < limit):
+            response = requests.get(
+                f'{self.base_url}/{endpoint}',
+                params={**params, 'page': page, 'page_size': self.page_size}
+            )
+            response.raise_for_status()
+            body = response.json()
+            frames.append(pd.DataFrame(body['columns']))
+            rows += len(frames[-1])
+            page = body['next_page']
+        data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if 'time' in data.columns:
+            data['time'] = pd.to_datetime(data['time'])
+        return data.head(limit) if limit is not None else data
+
+    def tracks(self, callsign=None, start=None, end=None, bbox=None, columns=None, limit=None):
+        return self._get('tracks', {
+            'callsign': callsign, 'start': start, 'end': end,
+            'bbox': ','.join(map(str, bbox)) if bbox else None,
+            'columns': ','.join(columns) if columns else None,
+        }, limit)
+
+    def events(self, location=None, callsign=None, start=None, end=None, columns=None, limit=None):
+        return self._get('events', {
+            'location': location, 'callsign': callsign, 'start': start, 'end': end,
+            'columns': ','.join(columns) if columns else None,
+        }, limit)
+
+    def sel_rollup(self, by='type', location=None, start=None, end=None):
+        return self._get('rollup', {'by': by, 'location': location, 'start': start, 'end': end})
+
+    def stats(self):
+        """Row counts and time range per table (a plain dict, not paginated)."""
+        response = requests.get(f'{self.base_url}/stats')
+        response.raise_for_status()
+        return response.json()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Indexed local query service for tracks and noise events.')
+    parser.add_argument('--tracks', nargs='+', default=['Vluchten_Schiphol_2_uur.csv'], help='FlightAware track CSVs')
+    parser.add_argument('--events', nargs='+', default=['my_data.csv'], help='Sensornet event CSVs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    tracks = pd.concat([load_tracks(p) for p in args.tracks], ignore_index=True)
+    events = pd.concat([load_events(p) for p in args.events], ignore_index=True)
+    serve(TrackEventStore(tracks, events), args.host, args.port)
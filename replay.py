@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from flight_tracks import SCHIPHOL_LAT, SCHIPHOL_LON, haversine_km
+
+# -------------------------------------------------------------------------
+# Time-scrub replay: every flight is interpolated once onto a uniform time
+# grid and stored as positions[step, flight] = (lat, lon, altitude_ft).
+# A slider tick is then just an array lookup (frame()).
+# -------------------------------------------------------------------------
+DEFAULT_STEP_S = 1
+MAX_GAP_S = 120  # don't interpolate across holes in the ADS-B coverage
+
+
+def build_replay(tracks, start=None, end=None, step_s=DEFAULT_STEP_S, max_gap_s=MAX_GAP_S, radius_km=None):
+    """
+    Pre-interpolate all flights in 'tracks' (output of flight_tracks.prepare_tracks)
+    between start and end. Returns a dict with 'times' (T,), 'flights' (F,) and
+    'positions' (T, F, 3) float32, NaN where a flight is not in the air/visible.
+    """
+    points = tracks[['FlightNumber', 'time', 'Latitude', 'Longitude', 'Altitude_feet']].dropna(
+        subset=['FlightNumber', 'time', 'Latitude', 'Longitude']
+    )
+    if radius_km is not None:
+        distance = haversine_km(SCHIPHOL_LAT, SCHIPHOL_LON, points['Latitude'].to_numpy(), points['Longitude'].to_numpy())
+        points = points[distance < radius_km]
+
+    start = pd.Timestamp(start) if start is not None else points['time'].min()
+    end = pd.Timestamp(end) if end is not None else points['time'].max()
+    # Keep one point on either side of the window so the edges interpolate too
+    pad = pd.Timedelta(seconds=max_gap_s)
+    points = points[(points['time'] >= start - pad) & (points['time'] <= end + pad)]
+    points = points.sort_values(['FlightNumber', 'time']).drop_duplicates(['FlightNumber', 'time'])
+
+    times = pd.date_range(start, end, freq=f'{step_s}s')
+    # Offsets in seconds via timedeltas, not asi8: on pandas 3 the unit can be us or s
+    grid_s = (times - times[0]).total_seconds().to_numpy()
+    flights = points['FlightNumber'].unique()
+    positions = np.full((len(times), len(flights), 3), np.nan, dtype=np.float32)
+
+    for f, (_, flight) in enumerate(points.groupby('FlightNumber', sort=False)):
+        t = (flight['time'] - times[0]).dt.total_seconds().to_numpy()
+        if len(t) < 2:
+            continue
+        # Only grid steps between two reports that are close enough in time
+        inside = (grid_s >= t[0]) & (grid_s <= t[-1])
+        right = np.clip(np.searchsorted(t, grid_s, side='left'), 1, len(t) - 1)
+        inside &= (t[right] - t[right - 1]) <= max_gap_s
+
+        for k, column in enumerate(['Latitude', 'Longitude', 'Altitude_feet']):
+            values = flight[column].to_numpy(dtype=float)
+            known = np.isfinite(values)
+            if known.sum() < 2:
+                continue
+            positions[inside, f, k] = np.interp(grid_s[inside], t[known], values[known])
+
+    return {'times': times, 'flights': flights, 'positions': positions, 'step_s': step_s}
+
+
+def step_for_time(replay, when):
+    """Index of the grid step closest to 'when'."""
+    offset = (pd.Timestamp(when) - replay['times'][0]).total_seconds()
+    return int(np.clip(round(offset / replay['step_s']), 0, len(replay['times']) - 1))
+
+
+def frame(replay, step):
+    """Flights visible at a step as a small DataFrame (FlightNumber, lat, lon, alt)."""
+    positions = replay['positions'][step]
+    visible = np.isfinite(positions[:, 0])
+    return pd.DataFrame({
+        'FlightNumber': replay['flights'][visible],
+        'Latitude': positions[visible, 0],
+        'Longitude': positions[visible, 1],
+        'Altitude_feet': positions[visible, 2],
+    })
+
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from flight_tracks import local_xy, parse_course
+
+# -------------------------------------------------------------------------
+# Runway and direction assignment for ADS-B tracks (FlightAware / OpenSky).
+#
+# Every runway direction gets two geometric gates in local metres:
+#   - arrival gate: a funnel on the extended centreline before the landing
+#     threshold, below a 3° glide path (+ margin), on the runway heading
+#   - departure gate: a funnel from the start of the takeoff roll out past
+#     the departure end, on the runway heading, still low
+# All track points are tested against all runway directions at once
+# (points x runway ends arrays); per flight the direction with the most hits
+# wins. A full day of traffic is a handful of array operations.
+#
+# Threshold coordinates are approximate (good to a few tens of metres), which
+# is plenty for gates that are hundreds of metres wide.
+# -------------------------------------------------------------------------
+FEET_PER_M = 3.28084
+
+# name: ((lat, lon) of one end, (lat, lon) of the other end, designator at the first end, at the second end)
+RUNWAYS = {
+    'Polderbaan': ((52.3627, 4.7115), (52.3287, 4.7090), '18R', '36L'),
+    'Zwanenburgbaan': ((52.3313, 4.7400), (52.3008, 4.7375), '18C', '36C'),
+    'Aalsmeerbaan': ((52.3213, 4.7801), (52.2900, 4.7774), '18L', '36R'),
+    'Kaagbaan': ((52.2878, 4.7347), (52.3044, 4.7781), '06', '24'),
+    'Buitenveldertbaan': ((52.3166, 4.7468), (52.3182, 4.7966), '09', '27'),
+    'Oostbaan': ((52.3008, 4.7834), (52.3133, 4.8006), '04', '22'),
+}
+
+# Operation suffix as in the Sensornet tags (e.g. 'Zwanenburgbaan36C_L');
+# 'S' (start) for departures
+ARRIVAL, DEPARTURE = 'L', 'S'
+
+APPROACH_LENGTH_M = 15_000    # arrival gate starts this far before the threshold
+CLIMB_OUT_LENGTH_M = 10_000   # departure gate reaches this far past the runway end
+GATE_HALF_WIDTH_M = 200
+GATE_SPLAY = 0.08             # funnel widens ~4.6° away from the runway
+GLIDE_SLOPE = np.tan(np.radians(3.0))
+ALTITUDE_MARGIN_FT = 1_000
+MAX_DEPARTURE_ALT_FT = 6_000
+MAX_COURSE_DIFF_DEG = 20
+MIN_HITS = 2
+CHUNK_POINTS = 200_000        # bounds the points x runway ends arrays
+
+
+def runway_ends():
+    """
+    One row per runway direction: designator, threshold and far end in local
+    metres, unit direction vector, heading and length.
+    """
+    rows = []
+    for name, (end_a, end_b, designator_a, designator_b) in RUNWAYS.items():
+        # Landing on 'designator_b' means moving from end_b towards end_a and vice versa
+        for (threshold, far_end, designator) in ((end_a, end_b, designator_a), (end_b, end_a, designator_b)):
+            tx, ty = local_xy(*threshold)
+            fx, fy = local_xy(*far_end)
+            length = np.hypot(fx - tx, fy - ty)
+            rows.append({
+                'runway_name': name,
+                'runway': designator,
+                'tx': float(tx), 'ty': float(ty),
+                'ux': float((fx - tx) / length), 'uy': float((fy - ty) / length),
+                'heading': float(np.degrees(np.arctan2(fx - tx, fy - ty)) % 360),
+                'length': float(length),
+            })
+    return pd.DataFrame(rows)
+
+
+def _course_ok(course, heading):
+    diff = np.abs((course[:, None] - heading[None, :] + 180) % 360 - 180)
+    return np.isnan(course)[:, None] | (diff <= MAX_COURSE_DIFF_DEG)
+
+
+def gate_hits(tracks, ends=None, course_col='Course', altitude_col='Altitude_feet'):
+    """
+    Boolean (points x runway ends) matrices for the arrival and departure gates.
+    Missing course/altitude don't fail a gate (ground and low reports often lack them).
+    """
+    ends = runway_ends() if ends is None else ends
+    x, y = local_xy(tracks['Latitude'], tracks['Longitude'])
+    course = parse_course(tracks[course_col]).to_numpy(dtype=float)
+    altitude = pd.to_numeric(tracks[altitude_col], errors='coerce').to_numpy(dtype=float)
+
+    dx = x[:, None] - ends['tx'].to_numpy()[None, :]
+    dy = y[:, None] - ends['ty'].to_numpy()[None, :]
+    ux, uy = ends['ux'].to_numpy()[None, :], ends['uy'].to_numpy()[None, :]
+    along = dx * ux + dy * uy           # > 0 past the threshold in the direction of travel
+    cross = np.abs(dx * uy - dy * ux)
+    length = ends['length'].to_numpy()[None, :]
+    heading_ok = _course_ok(course, ends['heading'].to_numpy())
+    no_altitude = np.isnan(altitude)[:, None]
+
+    # Arrival: before the threshold (and a bit onto the runway), below the glide path
+    before = np.maximum(-along, 0)
+    arrival = (
+        (along >= -APPROACH_LENGTH_M) & (along <= length)
+        & (cross <= GATE_HALF_WIDTH_M + GATE_SPLAY * before)
+        & (no_altitude | (altitude[:, None] <= before * GLIDE_SLOPE * FEET_PER_M + ALTITUDE_MARGIN_FT))
+        & heading_ok
+    )
+
+    # Departure: on the runway or past its far end, climbing out on the heading
+    beyond = np.maximum(along - length, 0)
+    departure = (
+        (along >= 0) & (along <= length + CLIMB_OUT_LENGTH_M)
+        & (cross <= GATE_HALF_WIDTH_M + GATE_SPLAY * beyond)
+        & (no_altitude | (altitude[:, None] <= MAX_DEPARTURE_ALT_FT))
+        & heading_ok
+    )
+    return arrival, departure
+
+
+def assign_runways(tracks, flight_col='FlightNumber', operation_col='FlightType', **columns):
+    """
+    One row per flight with runway_name, runway, operation ('L'/'S'), tag
+    (e.g. 'Zwanenburgbaan36C_L') and the number of gate hits. Flights that hit
+    no gate often enough get NaN.
+
+    If the tracks have a FlightType column ('Arrivals'/'Departures') only the
+    matching gate is used; otherwise the gate with the most hits wins.
+    """
+    ends = runway_ends()
+    codes, flights = pd.factorize(tracks[flight_col])
+    F, R = len(flights), len(ends)
+
+    if operation_col in tracks.columns:
+        kind = tracks[operation_col].astype(str).str.lower()
+        is_arrival = kind.str.startswith('arr').to_numpy()
+        is_departure = kind.str.startswith('dep').to_numpy()
+    else:
+        is_arrival = is_departure = np.ones(len(tracks), dtype=bool)
+
+    def counts(hits, mask, chunk_codes):
+        # Hits per (flight, runway end) in one bincount over flight * R + end
+        point, end = np.nonzero(hits & (mask & (chunk_codes >= 0))[:, None])
+        return np.bincount(chunk_codes[point] * R + end, minlength=F * R).reshape(F, R)
+
+    # (F, 2R): arrival ends first, then departure ends
+    hits = np.zeros((F, 2 * R), dtype=np.int64)
+    for start in range(0, len(tracks), CHUNK_POINTS):
+        part = slice(start, start + CHUNK_POINTS)
+        arrival, departure = gate_hits(tracks.iloc[part], ends, **columns)
+        hits[:, :R] += counts(arrival, is_arrival[part], codes[part])
+        hits[:, R:] += counts(departure, is_departure[part], codes[part])
+
+    best = hits.argmax(axis=1)
+    best_hits = hits[np.arange(F), best]
+    assigned = best_hits >= MIN_HITS
+
+    end = best % R
+    operation = np.where(best < R, ARRIVAL, DEPARTURE)
+    result = pd.DataFrame({
+        flight_col: flights,
+        'runway_name': ends['runway_name'].to_numpy()[end],
+        'runway': ends['runway'].to_numpy()[end],
+        'operation': operation,
+        'gate_hits': best_hits,
+    })
+    result.loc[~assigned, ['runway_name', 'runway', 'operation']] = np.nan
+    result['tag'] = result['runway_name'] + result['runway'] + '_' + result['operation']
+    return result
+
+
+def runway_noise_rollup(events, assignment, callsign_col='callsign', flight_col='FlightNumber'):
+    """Event count and mean/max SEL_dB per assigned runway direction."""
+    merged = events.merge(
+        assignment[[flight_col, 'tag']].dropna(), left_on=callsign_col, right_on=flight_col, how='inner'
+    )
+    return merged.groupby('tag').agg(
+        events=('SEL_dB', 'count'),
+        mean_SEL_dB=('SEL_dB', 'mean'),
+        max_SEL_dB=('SEL_dB', 'max'),
+    ).reset_index().sort_values('events', ascending=False)
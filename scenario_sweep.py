@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------------------
+# What-if sweeps for noise per passenger / per ton cargo.
+#
+# Instead of an iterrows loop per chosen load factor, every SEL event is
+# broadcast once against a grid of load factors and cabin configurations:
+#   noise_per_passenger[event, load_factor, config] = SEL / (seats * load_factor)
+# The (events x load factors x configs) cube is cached by the apps; moving a
+# slider is then only an index into it. It is float32: a few months of events
+# (~200k) x 11 load factors x 3 configurations is ~26 MB.
+# -------------------------------------------------------------------------
+DEFAULT_LOAD_FACTORS = np.round(np.arange(0.50, 1.0001, 0.05), 2)
+
+# Seat count relative to the standard layout in the capacity table.
+# A value can also be a {type: seats} dict for a specific layout per type.
+CABIN_CONFIGURATIONS = {
+    'Standaard': 1.0,
+    'Hoge dichtheid': 1.15,
+    'Premium': 0.8,
+}
+
+
+def build_scenario_cube(data, capacity, load_factors=DEFAULT_LOAD_FACTORS, configurations=None,
+                        type_col='vliegtuig_type', sel_col='SEL_dB',
+                        passengers_key='passengers', cargo_key='cargo_ton'):
+    """
+    Broadcast all events of known types against load_factors x configurations.
+
+    Returns a dict with the per-event cube 'noise_per_passenger' (E, L, C),
+    'noise_per_cargo' (E,), 'seats' (K, C), 'event_type' (E,) codes into
+    'types' (K,), and the 'load_factors'/'configurations' axes.
+    """
+    configurations = configurations or CABIN_CONFIGURATIONS
+    load_factors = np.asarray(load_factors, dtype=float)
+
+    types = [t for t in capacity if t in set(data[type_col].dropna())]
+    known = data[data[type_col].isin(types)]
+    codes = pd.Categorical(known[type_col], categories=types).codes
+    sel = pd.to_numeric(known[sel_col], errors='coerce').to_numpy(dtype=float)
+
+    base_seats = np.array([capacity[t][passengers_key] for t in types], dtype=float)
+    cargo = np.array([capacity[t][cargo_key] for t in types], dtype=float)
+    seats = np.column_stack([
+        np.array([value.get(t, capacity[t][passengers_key]) for t in types], dtype=float)
+        if isinstance(value, dict) else np.round(base_seats * value)
+        for value in configurations.values()
+    ]) if types else np.zeros((0, len(configurations)))
+
+    # (E, 1, C) * (1, L, 1) -> (E, L, C) occupied seats for every event and scenario
+    occupied = seats[codes][:, None, :] * load_factors[None, :, None]
+    event_cargo = cargo[codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        noise_per_passenger = np.where(occupied != 0, sel[:, None, None] / occupied, np.nan).astype(np.float32)
+        noise_per_cargo = np.where(event_cargo != 0, sel / event_cargo, np.nan)
+
+    return {
+        'types': types,
+        'load_factors': load_factors,
+        'configurations': list(configurations),
+        'seats': seats,
+        'event_type': codes,
+        'noise_per_passenger': noise_per_passenger,
+        'noise_per_cargo': noise_per_cargo,
+    }
+
+
+def _indices(cube, load_factor, configuration):
+    lf = int(np.abs(cube['load_factors'] - load_factor).argmin())
+    return lf, cube['configurations'].index(configuration)
+
+
+def slice_events(cube, load_factor, configuration):
+    """
+    Per-event rows for one scenario (a lookup in the cube), same columns as the
+    old row-by-row calculation (aircraft_type, passengers, noise_per_passenger,
+    noise_per_cargo). The load factor snaps to the nearest grid value.
+    """
+    lf, c = _indices(cube, load_factor, configuration)
+    codes = cube['event_type']
+    return pd.DataFrame({
+        'aircraft_type': np.asarray(cube['types'], dtype=object)[codes],
+        'passengers': cube['seats'][codes, c],
+        'noise_per_passenger': cube['noise_per_passenger'][:, lf, c].astype(float),
+        'noise_per_cargo': cube['noise_per_cargo'],
+    })
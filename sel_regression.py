@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------------------
+# Grouped regression of SEL_dB on distance and altitude (and wind), fitted
+# for every aircraft type/category at once.
+#
+#   SEL_dB ~ 1 + log10(distance) + altitude [+ wind_u + wind_v]
+#
+# Instead of one statsmodels fit per group we keep the least-squares
+# sufficient statistics per group (X'X, X'y, y'y, sum y, n). Those are built
+# with one np.bincount per matrix entry over all events and are simply added
+# to when new event windows arrive; a (re)fit is one batched np.linalg.solve
+# over all groups. Hundreds of types refit in milliseconds.
+#
+# Groups whose X'X is rank deficient (e.g. only calm-wind events with
+# wind=True, or one fixed distance and altitude) can't be identified and get
+# NaN coefficients instead of ridge-made numbers; they are flagged with
+# full_rank=False in the coefficient table.
+# -------------------------------------------------------------------------
+BASE_FEATURES = ['intercept', 'log10_distance', 'altitude']
+WIND_FEATURES = ['wind_u', 'wind_v']
+
+
+def design_matrix(events, wind=False):
+    """
+    Build X and y from Sensornet columns (distance, altitude, SEL_dB and
+    windspeed/winddirection when wind=True). Returns (X, y, valid) where
+    'valid' marks the rows without missing values.
+    """
+    distance = pd.to_numeric(events['distance'], errors='coerce').to_numpy(dtype=float)
+    columns = [
+        np.ones(len(events)),
+        np.log10(np.where(distance > 0, distance, np.nan)),
+        pd.to_numeric(events['altitude'], errors='coerce').to_numpy(dtype=float),
+    ]
+    if wind:
+        # Wind as a vector, so 'wind from 350' and 'wind from 10' are close
+        speed = pd.to_numeric(events['windspeed'], errors='coerce').to_numpy(dtype=float)
+        direction = np.radians(pd.to_numeric(events['winddirection'], errors='coerce').to_numpy(dtype=float))
+        columns += [speed * np.sin(direction), speed * np.cos(direction)]
+
+    X = np.column_stack(columns)
+    y = pd.to_numeric(events['SEL_dB'], errors='coerce').to_numpy(dtype=float)
+    valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return X, y, valid
+
+
+class GroupedSELRegression:
+    """
+    Incremental per-group least squares. Call update() with every new batch of
+    events and fit() (or coefficients()) whenever results are needed.
+    """
+
+    def __init__(self, group_col='type', wind=False, ridge=1e-8):
+        self.group_col = group_col
+        self.wind = wind
+        self.ridge = ridge
+        self.features = BASE_FEATURES + (WIND_FEATURES if wind else [])
+
+        p = len(self.features)
+        self.groups = []         # group name per row of the statistics
+        self._group_index = {}
+        self.xtx = np.zeros((0, p, p))
+        self.xty = np.zeros((0, p))
+        self.yty = np.zeros(0)
+        self.sum_y = np.zeros(0)
+        self.n = np.zeros(0, dtype=np.int64)
+        self.full_rank = np.zeros(0, dtype=bool)
+        self._coef = None
+
+    def _grow(self, names):
+        new = [name for name in names if name not in self._group_index]
+        if not new:
+            return
+        for name in new:
+            self._group_index[name] = len(self.groups)
+            self.groups.append(name)
+        extra = len(new)
+        p = len(self.features)
+        self.xtx = np.concatenate([self.xtx, np.zeros((extra, p, p))])
+        self.xty = np.concatenate([self.xty, np.zeros((extra, p))])
+        self.yty = np.concatenate([self.yty, np.zeros(extra)])
+        self.sum_y = np.concatenate([self.sum_y, np.zeros(extra)])
+        self.n = np.concatenate([self.n, np.zeros(extra, dtype=np.int64)])
+
+    def update(self, events):
+        """Add a batch of events to the per-group statistics."""
+        X, y, valid = design_matrix(events, self.wind)
+        group = events[self.group_col].to_numpy()
+        valid &= pd.notna(group)
+        X, y, group = X[valid], y[valid], group[valid]
+        if len(y) == 0:
+            return self
+
+        names, local_codes = np.unique(group.astype(str), return_inverse=True)
+        self._grow(names)
+        codes = np.array([self._group_index[name] for name in names])[local_codes]
+        G, p = len(self.groups), len(self.features)
+
+        for i in range(p):
+            self.xty[:, i] += np.bincount(codes, weights=X[:, i] * y, minlength=G)
+            for j in range(i, p):
+                s = np.bincount(codes, weights=X[:, i] * X[:, j], minlength=G)
+                self.xtx[:, i, j] += s
+                if i != j:
+                    self.xtx[:, j, i] += s
+        self.yty += np.bincount(codes, weights=y * y, minlength=G)
+        self.sum_y += np.bincount(codes, weights=y, minlength=G)
+        self.n += np.bincount(codes, minlength=G)
+        self._coef = None
+        return self
+
+    def fit(self):
+        """
+        Solve all groups in one batched call; groups with too few events or a
+        rank-deficient X'X get NaN.
+        """
+        p = len(self.features)
+        coef = np.full((len(self.groups), p), np.nan)
+        diag = np.einsum('gii->gi', self.xtx)
+
+        # Rank on X'X scaled to unit diagonal, so altitude (hundreds of m) and the
+        # intercept count alike; an all-zero column stays zero and drops the rank
+        with np.errstate(divide='ignore'):
+            scale = np.where(diag > 0, 1 / np.sqrt(diag), 0.0)
+        scaled = self.xtx * scale[:, :, None] * scale[:, None, :]
+        full_rank = np.linalg.matrix_rank(scaled) == p if len(self.groups) else np.zeros(0, dtype=bool)
+        solvable = (self.n > p) & full_rank
+        if solvable.any():
+            # Ridge relative to the diagonal, with an absolute floor so it still
+            # acts on a zero diagonal entry
+            xtx = self.xtx[solvable]
+            ridge = self.ridge * np.maximum(diag[solvable], 1.0)
+            A = xtx + ridge[:, :, None] * np.eye(p)[None, :, :]
+            coef[solvable] = np.linalg.solve(A, self.xty[solvable][:, :, None])[:, :, 0]
+        self.full_rank = full_rank
+        self._coef = coef
+        return self
+
+    def coefficients(self):
+        """One row per group: n, full_rank, coefficients, RMSE and R²."""
+        if self._coef is None:
+            self.fit()
+        coef = self._coef
+        sse = (
+            self.yty
+            - 2 * np.einsum('gi,gi->g', coef, self.xty)
+            + np.einsum('gi,gij,gj->g', coef, self.xtx, coef)
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sst = self.yty - self.sum_y ** 2 / self.n
+            rmse = np.sqrt(np.maximum(sse, 0) / (self.n - len(self.features)))
+            r2 = 1 - sse / sst
+
+        result = pd.DataFrame(coef, columns=self.features)
+        result.insert(0, 'full_rank', self.full_rank)
+        result.insert(0, 'n', self.n)
+        result.insert(0, self.group_col, self.groups)
+        result['rmse'] = rmse
+        result['r2'] = r2
+        return result.sort_values('n', ascending=False).reset_index(drop=True)
+
+    def predict(self, events):
+        """Predicted SEL_dB per event (NaN for unknown groups or missing inputs)."""
+        if self._coef is None:
+            self.fit()
+        X, _, _ = design_matrix(events.assign(SEL_dB=np.nan), self.wind)
+        codes = events[self.group_col].astype(str).map(self._group_index)
+        prediction = np.full(len(events), np.nan)
+        known = codes.notna().to_numpy()
+        prediction[known] = np.einsum(
+            'ni,ni->n', X[known], self._coef[codes[known].astype(int).to_numpy()]
+        )
+        return pd.Series(prediction, index=events.index, name='SEL_dB_pred')
+
+
+def fit_grouped(events, group_col='type', wind=False):
+    """One-shot fit for all groups in 'events'; returns the coefficient table."""
+    return GroupedSELRegression(group_col, wind).update(events).coefficients()
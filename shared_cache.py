@@ -0,0 +1,263 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import argparse
+import inspect
+import functools
+import tempfile
+import datetime
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------------------
+# Disk-backed result cache shared by all Streamlit apps and batch jobs.
+#
+# `st.cache_data` only lives inside one Streamlit process; this cache lives in
+# a directory on disk, so the dashboard, hackatontest-Marijn.py,
+# geluidsmeting_vliegtuigen_gps.py and any notebook/batch job reuse each
+# other's Sensornet pulls and derived frames, also after a restart.
+#
+#   - entries are keyed by (namespace, query, pipeline version)
+#   - every entry has a TTL; the total size is bounded with LRU eviction
+#   - the index is a SQLite database in WAL mode, values are pickle files
+#     that are written to a temp file first and then atomically renamed, so
+#     concurrent readers never see a half written value
+# -------------------------------------------------------------------------
+CACHE_DIR = os.environ.get(
+    'SCHIPHOL_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+)
+
+# Bump this when a derived dataset changes shape/meaning, so old entries
+# are never returned to code that expects the new layout.
+PIPELINE_VERSION = '1'
+
+# Types whose repr() is exact, so it can be used for the key as is
+_EXACT_REPR_TYPES = (str, bytes, bool, int, float, complex, np.generic,
+                     datetime.date, datetime.time, datetime.timedelta)
+
+DEFAULT_TTL = 6 * 3600                 # seconds
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB on disk
+
+
+def _connect(cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    con = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), timeout=30, isolation_level=None)
+    con.execute('PRAGMA journal_mode=WAL')
+    con.execute(
+        'CREATE TABLE IF NOT EXISTS entries ('
+        ' key TEXT PRIMARY KEY,'
+        ' namespace TEXT,'
+        ' version TEXT,'
+        ' filename TEXT,'
+        ' size INTEGER,'
+        ' created REAL,'
+        ' last_access REAL,'
+        ' expires REAL)'
+    )
+    return con
+
+
+def _fingerprint(obj):
+    """
+    Turn a query argument into something stable to hash.
+    DataFrames/Series and arrays are hashed by content instead of by repr
+    (numpy shortens the repr of big arrays, so different arrays would collide).
+    Anything without a known exact representation raises TypeError.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        content = pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes()
+        columns = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+        return ('frame', repr(columns), hashlib.sha256(content).hexdigest())
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return ('array', obj.shape, tuple(_fingerprint(v) for v in obj.ravel().tolist()))
+        content = np.ascontiguousarray(obj).tobytes()
+        return ('array', str(obj.dtype), obj.shape, hashlib.sha256(content).hexdigest())
+    if isinstance(obj, dict):
+        return ('dict', tuple(sorted((repr(k), _fingerprint(v)) for k, v in obj.items())))
+    if isinstance(obj, (list, tuple)):
+        return (type(obj).__name__, tuple(_fingerprint(v) for v in obj))
+    if isinstance(obj, (set, frozenset)):
+        return ('set', tuple(sorted(repr(_fingerprint(v)) for v in obj)))
+    if obj is None or isinstance(obj, _EXACT_REPR_TYPES):
+        return (type(obj).__name__, repr(obj))
+    raise TypeError(f'shared_cache cannot build a key from an argument of type {type(obj).__name__}')
+
+
+def make_key(namespace, query, version=PIPELINE_VERSION):
+    """Build the cache key for a query within a namespace and pipeline version."""
+    raw = repr((namespace, version, _fingerprint(query))).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def get(key, cache_dir=None):
+    """
+    Returns (True, value) on a fresh hit and (False, None) otherwise.
+    Expired entries are removed on the way.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    con = _connect(cache_dir)
+    try:
+        row = con.execute('SELECT filename, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return False, None
+        filename, expires = row
+        path = os.path.join(cache_dir, filename)
+        if expires < time.time():
+            _delete(con, cache_dir, key, filename)
+            return False, None
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except Exception:
+            # Value file is gone or unreadable: evicted by another process, or
+            # written by a replica with other library versions (AttributeError,
+            # ModuleNotFoundError, ...). Either way it is a miss.
+            _delete(con, cache_dir, key, filename)
+            return False, None
+        con.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        return True, value
+    finally:
+        con.close()
+
+
+def put(key, value, namespace='', version=PIPELINE_VERSION, ttl=DEFAULT_TTL,
+        max_bytes=DEFAULT_MAX_BYTES, cache_dir=None):
+    """Store a value and evict least recently used entries above max_bytes."""
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = key + '.pkl'
+
+    # Write to a temp file first, then rename: readers only ever see complete files
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, os.path.join(cache_dir, filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    now = time.time()
+    con = _connect(cache_dir)
+    try:
+        con.execute('BEGIN IMMEDIATE')
+        con.execute(
+            'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, namespace, version, filename, size, now, now, now + ttl)
+        )
+        _evict(con, cache_dir, max_bytes)
+        con.execute('COMMIT')
+    except BaseException:
+        con.execute('ROLLBACK')
+        raise
+    finally:
+        con.close()
+
+
+def _delete(con, cache_dir, key, filename):
+    con.execute('DELETE FROM entries WHERE key = ?', (key,))
+    try:
+        os.remove(os.path.join(cache_dir, filename))
+    except OSError:
+        pass
+
+
+def _evict(con, cache_dir, max_bytes):
+    """Drop expired entries, then the least recently used ones until we fit."""
+    for key, filename in con.execute('SELECT key, filename FROM entries WHERE expires < ?', (time.time(),)).fetchall():
+        _delete(con, cache_dir, key, filename)
+
+    total = con.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+    if total <= max_bytes:
+        return
+    for key, filename, size in con.execute('SELECT key, filename, size FROM entries ORDER BY last_access').fetchall():
+        _delete(con, cache_dir, key, filename)
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def clear(cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    con = _connect(cache_dir)
+    try:
+        for key, filename in con.execute('SELECT key, filename FROM entries').fetchall():
+            _delete(con, cache_dir, key, filename)
+    finally:
+        con.close()
+
+
+def stats(cache_dir=None):
+    """Number of entries and bytes on disk per namespace."""
+    con = _connect(cache_dir)
+    try:
+        rows = con.execute(
+            'SELECT namespace, version, COUNT(*), SUM(size) FROM entries GROUP BY namespace, version'
+        ).fetchall()
+    finally:
+        con.close()
+    return [
+        {'namespace': ns, 'version': v, 'entries': n, 'bytes': b}
+        for ns, v, n, b in rows
+    ]
+
+
+# -------------------------------------------------------------------------
+# Decorator
+# -------------------------------------------------------------------------
+def shared_cache(namespace=None, version=PIPELINE_VERSION, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Cache the result of a function on disk, keyed by its arguments (the query),
+    the namespace and the pipeline version. None results are not cached, so a
+    failed API call is retried next time.
+
+    Can be stacked under @st.cache_data: Streamlit keeps its in-memory copy,
+    this cache is shared between processes.
+    """
+    def decorator(func):
+        ns = namespace or func.__qualname__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Key on the bound arguments incl. defaults, so fetch_data() and
+            # fetch_data(url=...) with a different default URL never collide
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            try:
+                key = make_key(ns, dict(bound.arguments), version)
+            except TypeError:
+                return func(*args, **kwargs)  # no stable key for these arguments: just don't cache
+            try:
+                hit, value = get(key)
+            except (sqlite3.Error, OSError):
+                hit, value = False, None  # a broken cache should never break the app
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            if value is not None:
+                try:
+                    put(key, value, ns, version, ttl, max_bytes)
+                except (sqlite3.Error, OSError, pickle.PicklingError):
+                    pass
+            return value
+        return wrapper
+    return decorator
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the shared Schiphol result cache.')
+    parser.add_argument('--clear', action='store_true', help='remove all entries')
+    args = parser.parse_args()
+
+    if args.clear:
+        clear()
+    for row in stats():
+        print(f"{row['namespace']} (v{row['version']}): {row['entries']} entries, {row['bytes']} bytes")